@@ -8,13 +8,21 @@ Output: JSON array of task objects with {type, prompt, priority, source_paper}
 
 import json
 import os
-import glob
 import re
+import string
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 OUTPUT_DIR = Path(__file__).parent / "output"
 TASKS_DIR = Path(__file__).parent / "tasks"
 
+# Match ### [score] Title\nKeywords: ...\nLink: ...
+_REPORT_RE = re.compile(r'### \[(\d+)\] (.+?)\nKeywords: (.+?)\nLink: (.+?)(?:\n|$)')
+
 # Task templates keyed by paper keyword clusters
 TEMPLATES = {
     "adversarial": {
@@ -92,17 +100,68 @@ DEFAULT_TEMPLATE = {
     "priority": 3,
 }
 
+# (lowercased key, template), highest priority first; the sort is stable,
+# so templates of equal priority keep their TEMPLATES order
+_TEMPLATE_KEYS_LC = sorted(
+    ((key.lower(), tmpl) for key, tmpl in TEMPLATES.items()),
+    key=lambda item: item[1]["priority"],
+    reverse=True,
+)
+
+
+def _split_template(template):
+    """Pre-split a str.format template into literal chunks and field names.
+
+    Returns (chunks, fields) with len(chunks) == len(fields) + 1. Only plain
+    {name} fields are supported.
+    """
+    chunks, fields = [""], []
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        chunks[-1] += literal
+        if field is not None:
+            if spec or conversion:
+                raise ValueError(f"unsupported format field in template: {field}")
+            fields.append(field)
+            chunks.append("")
+    return tuple(chunks), tuple(fields)
+
+
+def render_prompt(tmpl, **values):
+    """Fill a template's prompt from its pre-split parts; same result as str.format."""
+    chunks, fields = tmpl["prompt_parts"]
+    parts = [chunks[0]]
+    for field, chunk in zip(fields, chunks[1:]):
+        parts.append(str(values[field]))
+        parts.append(chunk)
+    return "".join(parts)
+
+
+for _tmpl in (*TEMPLATES.values(), DEFAULT_TEMPLATE):
+    _tmpl["prompt_parts"] = _split_template(_tmpl["prompt_template"])
+
 
 def get_latest_report():
     """Find the most recent autoprompt report."""
-    reports = sorted(glob.glob(str(OUTPUT_DIR / "report-*.json")))
-    if not reports:
+    # Timestamps in the filenames sort lexically, so one pass picks the newest
+    latest_json = latest_md = None
+    try:
+        with os.scandir(OUTPUT_DIR) as it:
+            for entry in it:
+                name = entry.name
+                if name.startswith("report-") and name.endswith(".json"):
+                    if latest_json is None or name > latest_json:
+                        latest_json = name
+                elif name.startswith("diff-") and name.endswith(".md"):
+                    if latest_md is None or name > latest_md:
+                        latest_md = name
+    except FileNotFoundError:
+        return None
+    if latest_json is None:
         # Fall back to markdown
-        mds = sorted(glob.glob(str(OUTPUT_DIR / "diff-*.md")))
-        if not mds:
+        if latest_md is None:
             return None
-        return parse_markdown_report(mds[-1])
-    with open(reports[-1]) as f:
+        return parse_markdown_report(OUTPUT_DIR / latest_md)
+    with open(OUTPUT_DIR / latest_json) as f:
         data = json.load(f)
     # Normalize: report JSON has 'papers' key with 'matched_keywords'
     if "papers" in data:
@@ -118,9 +177,7 @@ def parse_markdown_report(path):
     with open(path) as f:
         content = f.read()
 
-    # Match ### [score] Title\nKeywords: ...\nLink: ...
-    pattern = r'### \[(\d+)\] (.+?)\nKeywords: (.+?)\nLink: (.+?)(?:\n|$)'
-    for m in re.finditer(pattern, content):
+    for m in _REPORT_RE.finditer(content):
         papers.append({
             "score": int(m.group(1)),
             "title": m.group(2).strip(),
@@ -130,18 +187,14 @@ def parse_markdown_report(path):
     return {"papers": papers}
 
 
-def match_template(keywords):
-    """Find best matching template for paper keywords."""
-    best = None
-    best_prio = -1
-    for kw_key, tmpl in TEMPLATES.items():
-        for kw in keywords:
-            if kw_key in kw.lower():
-                if tmpl["priority"] > best_prio:
-                    best = tmpl
-                    best_prio = tmpl["priority"]
-                    break
-    return best or DEFAULT_TEMPLATE
+def match_template(keywords_lc):
+    """Find best matching template for lowercased paper keywords."""
+    # Highest priority first, so the first hit is the best match
+    for key_lc, tmpl in _TEMPLATE_KEYS_LC:
+        for kw in keywords_lc:
+            if key_lc in kw:
+                return tmpl
+    return DEFAULT_TEMPLATE
 
 
 def generate_tasks(report, min_score=5, max_tasks=5):
@@ -154,8 +207,10 @@ def generate_tasks(report, min_score=5, max_tasks=5):
 
     tasks = []
     for paper in papers:
-        tmpl = match_template(paper.get("keywords", []))
-        prompt = tmpl["prompt_template"].format(
+        kws_lc = paper.get("matched_keywords_lc") or [k.lower() for k in paper.get("keywords", [])]
+        tmpl = match_template(kws_lc)
+        prompt = render_prompt(
+            tmpl,
             title=paper["title"],
             link=paper.get("link", "N/A"),
         )
@@ -182,8 +237,11 @@ def main():
     TASKS_DIR.mkdir(exist_ok=True)
     # Write latest tasks
     out_path = TASKS_DIR / "latest.json"
-    with open(out_path, "w") as f:
-        json.dump(tasks, f, indent=2)
+    if orjson is not None:
+        out_path.write_bytes(orjson.dumps(tasks, option=orjson.OPT_INDENT_2))
+    else:
+        with open(out_path, "w") as f:
+            json.dump(tasks, f, indent=2)
 
     print(f"Generated {len(tasks)} tasks from autoprompt report:")
     for t in tasks:
@@ -1,21 +1,66 @@
 """Diff engine: compare paper findings against current Seithar prompts, output suggested changes."""
 import os
-import re
-import glob
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 
+import ahocorasick
+
+from src.section_cache import get_sections
+
+
+def _is_header(line):
+    """Equivalent to re.match(r'^#{1,3}\\s+', line) without entering the regex engine."""
+    if line[:1] != "#":
+        return False
+    stripped = line.lstrip("#")
+    return len(line) - len(stripped) <= 3 and stripped[:1].isspace()
+
+
+# (name fragment, extensions) pairs; same case-sensitive matches as the old
+# **/*SOUL*.md, **/*prompt*.txt, ... glob patterns
+PROMPT_FILE_HINTS = [
+    ("SOUL", (".md",)),
+    ("BRIEFING", (".txt", ".md")),
+    ("prompt", (".md", ".txt", ".yaml")),
+    ("AGENTS", (".md",)),
+    ("SYSTEM", (".md",)),
+]
+SKIP_DIRS = {"node_modules", "output", "venv", "__pycache__"}
+
+
+def _is_prompt_file(name):
+    for hint, exts in PROMPT_FILE_HINTS:
+        for ext in exts:
+            if name.endswith(ext) and hint in name[:-len(ext)]:
+                return True
+    return False
+
+
+def _loops_back(root, name):
+    """True if root/name is a symlink to root itself or one of its ancestors."""
+    path = os.path.join(root, name)
+    if not os.path.islink(path):
+        return False
+    target = os.path.realpath(path)
+    real_root = os.path.realpath(root)
+    return real_root == target or real_root.startswith(target.rstrip(os.sep) + os.sep)
+
 
 def find_prompt_files(prompts_dir):
     """Locate all files likely containing system prompts."""
-    patterns = [
-        "**/*SOUL*.md", "**/*BRIEFING*.txt", "**/*BRIEFING*.md",
-        "**/*prompt*.md", "**/*prompt*.txt", "**/*prompt*.yaml",
-        "**/*AGENTS*.md", "**/*SYSTEM*.md"
-    ]
     found = []
-    for pattern in patterns:
-        found.extend(glob.glob(os.path.join(prompts_dir, pattern), recursive=True))
-    return list(set(found))
+    # like glob's "**", descend into symlinked directories, minus cycles
+    for root, dirs, files in os.walk(prompts_dir, followlinks=True):
+        # like glob, skip hidden entries
+        dirs[:] = [
+            d for d in dirs
+            if not d.startswith(".") and d not in SKIP_DIRS and not _loops_back(root, d)
+        ]
+        for name in files:
+            if not name.startswith(".") and _is_prompt_file(name):
+                found.append(os.path.join(root, name))
+    return found
 
 
 def extract_sections(filepath):
@@ -31,7 +76,7 @@ def extract_sections(filepath):
     current_lines = []
     
     for line in content.split("\n"):
-        if re.match(r'^#{1,3}\s+', line):
+        if _is_header(line):
             if current_lines:
                 sections.append({
                     "header": current_header,
@@ -51,85 +96,146 @@ def extract_sections(filepath):
     return sections
 
 
-def generate_suggestions(papers, prompt_files):
+@dataclass(slots=True, frozen=True)
+class Suggestion:
+    """One proposed prompt update; use dataclasses.asdict() to serialize."""
+    paper: str
+    paper_link: str
+    paper_score: int
+    type: str
+    target_file: str
+    target_section: str
+    suggestion: str
+
+
+# Map paper topics to prompt improvement categories
+TOPIC_MAP = {
+    "jailbreak": {
+        "sections": ["BEHAVIOR", "SAFETY", "CONSTRAINT", "NEVER"],
+        "suggestion_type": "defense_hardening",
+        "template": "Paper '{title}' describes new {kw} techniques. Review defensive constraints in [{section}] for gaps."
+    },
+    "prompt injection": {
+        "sections": ["BEHAVIOR", "SAFETY", "INPUT", "CONSTRAINT"],
+        "suggestion_type": "injection_defense",
+        "template": "Paper '{title}' covers {kw} vectors. Audit [{section}] for injection surface."
+    },
+    "chain of thought": {
+        "sections": ["BEHAVIOR", "REASONING", "THINKING", "PROCESS"],
+        "suggestion_type": "reasoning_upgrade",
+        "template": "Paper '{title}' presents improved {kw} methods. Consider updating reasoning directives in [{section}]."
+    },
+    "alignment": {
+        "sections": ["BEHAVIOR", "CORE", "PRINCIPLE", "IDENTITY"],
+        "suggestion_type": "alignment_update",
+        "template": "Paper '{title}' has findings on {kw}. Review behavioral alignment in [{section}]."
+    },
+    "persona": {
+        "sections": ["IDENTITY", "TONE", "VOICE", "ROLE"],
+        "suggestion_type": "persona_refinement",
+        "template": "Paper '{title}' studies {kw} dynamics in LLMs. Consider implications for [{section}]."
+    },
+    "instruction tuning": {
+        "sections": ["BEHAVIOR", "CORE", "TASK", "OPERATIONAL"],
+        "suggestion_type": "instruction_optimization",
+        "template": "Paper '{title}' improves {kw} methods. Evaluate instruction structure in [{section}]."
+    },
+}
+
+
+def _build_topic_index():
+    """Index TOPIC_MAP for keyword lookups.
+
+    The automaton finds topics contained in a keyword; the substring table
+    maps every substring of a topic back to the topics containing it.
+    """
+    automaton = ahocorasick.Automaton()
+    substrings = {}
+    for topic in TOPIC_MAP:
+        automaton.add_word(topic, topic)
+        for i in range(len(topic)):
+            for j in range(i + 1, len(topic) + 1):
+                substrings.setdefault(topic[i:j], set()).add(topic)
+    automaton.make_automaton()
+    return automaton, substrings
+
+
+_TOPIC_AC, _TOPIC_SUBSTRINGS = _build_topic_index()
+
+
+@lru_cache(maxsize=None)
+def _topics_for(kw_l):
+    """Return topics t with t in kw_l or kw_l in t, in TOPIC_MAP order."""
+    hits = {topic for _, topic in _TOPIC_AC.iter(kw_l)}
+    hits.update(_TOPIC_SUBSTRINGS.get(kw_l, ()))
+    return tuple(topic for topic in TOPIC_MAP if topic in hits)
+
+
+def generate_suggestions(papers, prompt_files, section_cache=None):
     """Generate diff-style suggestions based on paper findings.
     
     This v0 uses keyword matching to identify which prompt sections
     could benefit from insights in the papers. A future version will
     use LLM inference for deeper analysis.
+
+    If section_cache is given (see src.section_cache), unchanged prompt
+    files are not re-parsed.
     """
-    suggestions = []
-    
-    # Map paper topics to prompt improvement categories
-    topic_map = {
-        "jailbreak": {
-            "sections": ["BEHAVIOR", "SAFETY", "CONSTRAINT", "NEVER"],
-            "suggestion_type": "defense_hardening",
-            "template": "Paper '{title}' describes new {kw} techniques. Review defensive constraints in [{section}] for gaps."
-        },
-        "prompt injection": {
-            "sections": ["BEHAVIOR", "SAFETY", "INPUT", "CONSTRAINT"],
-            "suggestion_type": "injection_defense",
-            "template": "Paper '{title}' covers {kw} vectors. Audit [{section}] for injection surface."
-        },
-        "chain of thought": {
-            "sections": ["BEHAVIOR", "REASONING", "THINKING", "PROCESS"],
-            "suggestion_type": "reasoning_upgrade",
-            "template": "Paper '{title}' presents improved {kw} methods. Consider updating reasoning directives in [{section}]."
-        },
-        "alignment": {
-            "sections": ["BEHAVIOR", "CORE", "PRINCIPLE", "IDENTITY"],
-            "suggestion_type": "alignment_update",
-            "template": "Paper '{title}' has findings on {kw}. Review behavioral alignment in [{section}]."
-        },
-        "persona": {
-            "sections": ["IDENTITY", "TONE", "VOICE", "ROLE"],
-            "suggestion_type": "persona_refinement",
-            "template": "Paper '{title}' studies {kw} dynamics in LLMs. Consider implications for [{section}]."
-        },
-        "instruction tuning": {
-            "sections": ["BEHAVIOR", "CORE", "TASK", "OPERATIONAL"],
-            "suggestion_type": "instruction_optimization",
-            "template": "Paper '{title}' improves {kw} methods. Evaluate instruction structure in [{section}]."
-        },
-    }
-    
+    # Parse each prompt file once and record, per topic, the first section of
+    # every file whose header names one of the topic's sections.
+    topic_hits = {topic: [] for topic in TOPIC_MAP}
+    for pf in prompt_files:
+        target_file = os.path.basename(pf)
+        pending = dict(TOPIC_MAP)
+        if section_cache is None:
+            sections = extract_sections(pf)
+        else:
+            sections = get_sections(pf, section_cache, extract_sections)
+        for section in sections:
+            if not pending:
+                break
+            header_upper = section["header"].upper()
+            for topic, config in list(pending.items()):
+                if any(s in header_upper for s in config["sections"]):
+                    topic_hits[topic].append((target_file, section["header"]))
+                    del pending[topic]  # one suggestion per file per paper-topic
+
+    # dedupe on (paper, file, type) as suggestions are produced
+    unique = {}
     for paper in papers:
-        matched_kws = [kw.lstrip("+") for kw in paper["matched_keywords"]]
-        for kw in matched_kws:
-            for topic, config in topic_map.items():
-                if topic in kw.lower() or kw.lower() in topic:
-                    for pf in prompt_files:
-                        sections = extract_sections(pf)
-                        for section in sections:
-                            header_upper = section["header"].upper()
-                            if any(s in header_upper for s in config["sections"]):
-                                suggestions.append({
-                                    "paper": paper["title"][:80],
-                                    "paper_link": paper["link"],
-                                    "paper_score": paper["score"],
-                                    "type": config["suggestion_type"],
-                                    "target_file": os.path.basename(pf),
-                                    "target_section": section["header"],
-                                    "suggestion": config["template"].format(
-                                        title=paper["title"][:60],
-                                        kw=kw,
-                                        section=section["header"]
-                                    )
-                                })
-                                break  # one suggestion per file per paper-topic
-    
-    # dedupe and sort by paper score
-    seen = set()
-    unique = []
-    for s in suggestions:
-        key = (s["paper"], s["target_file"], s["type"])
-        if key not in seen:
-            seen.add(key)
-            unique.append(s)
-    
-    unique.sort(key=lambda x: x["paper_score"], reverse=True)
-    return unique
+        # first keyword naming each topic; papers touching no topic are skipped
+        paper_topics = {}
+        for label, kw_l in zip(paper["matched_keywords"], paper["matched_keywords_lc"]):
+            for topic in _topics_for(kw_l):
+                paper_topics.setdefault(topic, label.lstrip("+~"))
+        if not paper_topics:
+            continue
+
+        paper_key = paper["title"][:80]
+        for topic, kw in paper_topics.items():
+            config = TOPIC_MAP[topic]
+            for target_file, header in topic_hits[topic]:
+                key = (paper_key, target_file, config["suggestion_type"])
+                if key in unique:
+                    continue
+                unique[key] = Suggestion(
+                    paper=paper_key,
+                    paper_link=paper["link"],
+                    paper_score=paper["score"],
+                    type=config["suggestion_type"],
+                    target_file=target_file,
+                    target_section=header,
+                    suggestion=config["template"].format(
+                        title=paper["title"][:60],
+                        kw=kw,
+                        section=header
+                    )
+                )
+
+    # sort by paper score
+    suggestions = list(unique.values())
+    suggestions.sort(key=lambda x: x.paper_score, reverse=True)
+    return suggestions
 
 
 if __name__ == "__main__":
@@ -1,16 +1,67 @@
 """arxiv RSS ingestion and keyword filtering."""
+import ahocorasick
 import feedparser
+import requests
 import yaml
 import json
 import re
 import os
+import heapq
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
 
+FETCH_WORKERS = 8
+SEEN_WINDOW = 500  # default number of entry ids remembered between runs
+
 
 def load_config(config_path="config.yaml"):
     with open(config_path) as f:
-        return yaml.safe_load(f)
+        config = yaml.safe_load(f)
+    config["_keyword_index"] = build_keyword_index(config)
+    return config
+
+
+def build_keyword_index(config):
+    """Build a single Aho-Corasick automaton over every scoring keyword.
+
+    Returns (automaton, slots). ``slots`` lists (kw_lower, label, weight,
+    covered_by) in the order score_entry evaluates them: tier by tier, longest
+    keyword first. ``label`` is the tier-prefixed keyword reported in
+    matched_keywords; ``covered_by`` holds the earlier slots whose keyword
+    strictly contains this one. Each automaton pattern maps to the indices of
+    the slots it satisfies, so a keyword listed in more than one tier still
+    scores once per tier.
+    """
+    tier_map = [
+        ("primary",   config["keywords"].get("primary", []),   config["scoring"]["primary_weight"]),
+        ("doctrinal", config["keywords"].get("doctrinal", []), config["scoring"].get("doctrinal_weight", 2)),
+        ("secondary", config["keywords"].get("secondary", []), config["scoring"]["secondary_weight"]),
+    ]
+
+    slots = []
+    by_pattern = {}
+    for tier_name, keywords, base_pts in tier_map:
+        prefix = "+" if tier_name == "primary" else ("~" if tier_name == "doctrinal" else "")
+        # Sort each tier longest-first so longer phrases claim the match before substrings
+        for kw in sorted(keywords, key=len, reverse=True):
+            kw_l = kw.lower()
+            if not kw_l:
+                continue
+            covered_by = tuple(
+                i for i, (other_l, _, _, _) in enumerate(slots)
+                if kw_l in other_l and kw_l != other_l
+            )
+            by_pattern.setdefault(kw_l, []).append(len(slots))
+            slots.append((kw_l, f"{prefix}{kw}", base_pts, covered_by))
+
+    automaton = ahocorasick.Automaton()
+    for kw_l, slot_ids in by_pattern.items():
+        automaton.add_word(kw_l, tuple(slot_ids))
+    if by_pattern:
+        automaton.make_automaton()
+    return automaton, slots
 
 
 def load_state(state_file):
@@ -30,7 +81,10 @@ def save_state(state_file, state):
 
 
 def score_entry(entry, config):
-    """Score an arxiv entry against keyword filters. Returns (score, matched_keywords).
+    """Score an arxiv entry against keyword filters.
+
+    Returns (score, matched_keywords, matched_keywords_lc): the tier-prefixed
+    labels, and the same keywords bare and lowercased for downstream matching.
 
     Deduplication rule: if a shorter keyword is a substring of an already-matched
     longer keyword, it is skipped to avoid double-counting (e.g. 'adversarial'
@@ -40,64 +94,112 @@ def score_entry(entry, config):
     summary = entry.get("summary", "").lower()
     text = f"{title} {summary}"
 
+    index = config.get("_keyword_index")
+    if index is None:
+        index = config["_keyword_index"] = build_keyword_index(config)
+    automaton, slots = index
+
+    # One pass over the text. A match ending before len(title) lies wholly
+    # inside the title, which is what earns the title multiplier.
+    hit_slots = set()
+    in_title = set()
+    if slots:
+        title_end = len(title)
+        for end, slot_ids in automaton.iter(text):
+            hit_slots.update(slot_ids)
+            if end < title_end:
+                in_title.update(slot_ids)
+
     score = 0
     matched = []
-    matched_lower = []  # tracks all matched keyword strings for dedup
+    matched_lc = []
+    matched_slots = set()  # for dedup against longer keywords already matched
+    title_multiplier = config["scoring"]["title_multiplier"]
 
-    def already_covered(kw):
-        """Return True if kw is a substring of any keyword already matched."""
-        return any(kw in m and kw != m for m in matched_lower)
+    for slot_id in sorted(hit_slots):
+        kw_l, label, base_pts, covered_by = slots[slot_id]
+        if any(i in matched_slots for i in covered_by):
+            continue
+        pts = base_pts
+        if slot_id in in_title:
+            pts *= title_multiplier
+        score += pts
+        matched.append(label)
+        matched_lc.append(kw_l)
+        matched_slots.add(slot_id)
 
-    tier_map = [
-        ("primary",   config["keywords"].get("primary", []),   config["scoring"]["primary_weight"]),
-        ("doctrinal", config["keywords"].get("doctrinal", []), config["scoring"].get("doctrinal_weight", 2)),
-        ("secondary", config["keywords"].get("secondary", []), config["scoring"]["secondary_weight"]),
-    ]
+    return score, matched, matched_lc
 
-    # Sort each tier longest-first so longer phrases claim the match before substrings
-    for tier_name, keywords, base_pts in tier_map:
-        for kw in sorted(keywords, key=len, reverse=True):
-            kw_l = kw.lower()
-            if kw_l not in text:
-                continue
-            if already_covered(kw_l):
-                continue
-            pts = base_pts
-            if kw_l in title:
-                pts *= config["scoring"]["title_multiplier"]
-            score += pts
-            prefix = "+" if tier_name == "primary" else ("~" if tier_name == "doctrinal" else "")
-            matched.append(f"{prefix}{kw}")
-            matched_lower.append(kw_l)
 
-    return score, matched
+def _fetch_one(feed_cfg, session, validators):
+    """Download and parse one feed.
+
+    ``validators`` holds the "etag"/"modified" values from the previous fetch
+    and is sent as a conditional request. Returns (entries, validators); on
+    HTTP 304 or failure the entries are [] and the old validators are kept.
+    """
+    headers = {"User-Agent": "SeitharAutoprompt/1.0"}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("modified"):
+        headers["If-Modified-Since"] = validators["modified"]
+    try:
+        print(f"[autoprompt] Fetching {feed_cfg['name']}...")
+        resp = session.get(feed_cfg["url"], headers=headers, timeout=15)
+        if resp.status_code == 304:
+            print(f"[autoprompt] {feed_cfg['name']}: not modified")
+            return [], validators
+        resp.raise_for_status()
+        feed = feedparser.parse(resp.content)
+        print(f"[autoprompt] {feed_cfg['name']}: {len(feed.entries)} entries")
+    except Exception as e:
+        print(f"[autoprompt] Failed to fetch {feed_cfg['name']}: {e}")
+        return [], validators
+    fresh = {}
+    if resp.headers.get("ETag"):
+        fresh["etag"] = resp.headers["ETag"]
+    if resp.headers.get("Last-Modified"):
+        fresh["modified"] = resp.headers["Last-Modified"]
+    return feed.entries, fresh
 
 
 def fetch_papers(config):
     """Fetch and filter papers from all configured feeds."""
     state = load_state(config["state_file"])
-    seen_ids = set(state["seen"][-500:])  # rolling window
+    now_iso = datetime.now(timezone.utc).isoformat()
+    # rolling window of entry ids, oldest first; trimmed only after this run
+    # so cross-listed entries are still deduped within it
+    window = config.get("seen_window", SEEN_WINDOW)
+    seen_ids = OrderedDict.fromkeys(state.get("seen", [])[-window:])
     results = []
-    
-    import urllib.request
-    
-    for feed_cfg in config["feeds"]:
-        try:
-            print(f"[autoprompt] Fetching {feed_cfg['name']}...")
-            req = urllib.request.Request(feed_cfg["url"], headers={"User-Agent": "SeitharAutoprompt/1.0"})
-            resp = urllib.request.urlopen(req, timeout=15)
-            raw = resp.read()
-            feed = feedparser.parse(raw)
-            print(f"[autoprompt] {feed_cfg['name']}: {len(feed.entries)} entries")
-        except Exception as e:
-            print(f"[autoprompt] Failed to fetch {feed_cfg['name']}: {e}")
-            continue
-        for entry in feed.entries:
+
+    # Downloads overlap on a shared keep-alive session; scoring and seen-id
+    # bookkeeping below stay on this thread.
+    feeds = config["feeds"]
+    etags = state.setdefault("etags", {})
+    workers = max(1, min(FETCH_WORKERS, len(feeds)))
+    with requests.Session() as session:
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=workers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            fetched = list(pool.map(
+                lambda feed_cfg: _fetch_one(feed_cfg, session, etags.get(feed_cfg["name"], {})),
+                feeds,
+            ))
+
+    for feed_cfg, (entries, validators) in zip(feeds, fetched):
+        if validators:
+            etags[feed_cfg["name"]] = validators
+        else:
+            etags.pop(feed_cfg["name"], None)
+        for entry in entries:
             eid = entry.get("id", entry.get("link", ""))
             if eid in seen_ids:
+                seen_ids.move_to_end(eid)
                 continue
             
-            score, matched = score_entry(entry, config)
+            score, matched, matched_lc = score_entry(entry, config)
             if score >= config["scoring"]["min_score"]:
                 results.append({
                     "id": eid,
@@ -107,17 +209,24 @@ def fetch_papers(config):
                     "feed": feed_cfg["name"],
                     "score": score,
                     "matched_keywords": matched,
-                    "fetched_at": datetime.now(timezone.utc).isoformat()
+                    "matched_keywords_lc": matched_lc,
+                    "fetched_at": now_iso
                 })
-            seen_ids.add(eid)
+            seen_ids[eid] = None
     
     # update state
+    while len(seen_ids) > window:
+        seen_ids.popitem(last=False)
     state["seen"] = list(seen_ids)
-    state["last_run"] = datetime.now(timezone.utc).isoformat()
+    state["last_run"] = now_iso
     save_state(config["state_file"], state)
     
-    results.sort(key=lambda x: x["score"], reverse=True)
-    return results
+    # highest scores first; nlargest is stable like sort, so ties keep feed order
+    max_papers = config.get("max_papers")
+    if max_papers is None:
+        results.sort(key=lambda x: x["score"], reverse=True)
+        return results
+    return heapq.nlargest(max_papers, results, key=lambda x: x["score"])
 
 
 if __name__ == "__main__":
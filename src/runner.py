@@ -2,19 +2,36 @@
 import json
 import os
 import sys
+from dataclasses import asdict
 from datetime import datetime, timezone
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # add parent to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.insert(0, str(Path.home() / "seithar-platform"))
 from src.ingester import load_config, fetch_papers
 from src.differ import find_prompt_files, generate_suggestions
+from src.section_cache import load_cache, save_cache
 from src.summarizer import batch_summarize
 from src.directives import build_directives_message, write_directives_payload, write_notification_status
 from engine.knowledge.taxonomy_store import TaxonomyStore
 
 
+def _write_json(path, obj):
+    """Write obj as indented JSON, using orjson when it is installed."""
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, "w") as f:
+            json.dump(obj, f, indent=2)
+
+
 def push_to_taxonomy_store(artifact_path: str):
     with open(artifact_path, "r", encoding="utf-8") as f:
         artifact = json.load(f)
@@ -67,66 +84,75 @@ def run(config_path="config.yaml"):
     if config.get("llm", {}).get("summarize", False):
         print(f"[autoprompt] Running LLM analysis on {len(papers)} papers via {config['llm']['model']}...")
         papers = batch_summarize(papers, config)
-        analyzed = sum(1 for p in papers if p.get("llm_analysis") and not p["llm_analysis"].get("error"))
+        analyzed = sum(
+            1 for p in papers
+            if p.get("llm_analysis") and not p["llm_analysis"].get("error") and not p["llm_analysis"].get("skipped")
+        )
         print(f"[autoprompt] {analyzed}/{len(papers)} papers analyzed successfully")
 
     prompts_dir = config.get("prompts_dir", "../")
     prompt_files = find_prompt_files(prompts_dir)
     print(f"[autoprompt] Found {len(prompt_files)} prompt files to analyze")
 
-    suggestions = generate_suggestions(papers, prompt_files)
+    section_cache_path = os.path.join(config["output_dir"], ".section_cache.json")
+    section_cache = load_cache(section_cache_path)
+    suggestions = generate_suggestions(papers, prompt_files, section_cache=section_cache)
+    save_cache(section_cache_path, section_cache)
     print(f"[autoprompt] Generated {len(suggestions)} suggestions")
 
     # Write output
     os.makedirs(config["output_dir"], exist_ok=True)
-    timestamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    run_dt = datetime.now(timezone.utc)
+    timestamp = run_dt.strftime("%Y%m%d-%H%M%S")
 
     # JSON output
     report = {
-        "run_at": datetime.now(timezone.utc).isoformat(),
+        "run_at": run_dt.isoformat(),
         "papers_found": len(papers),
         "suggestions_generated": len(suggestions),
         "papers": papers[:20],
-        "suggestions": suggestions
+        "suggestions": [asdict(s) for s in suggestions]
     }
     json_path = os.path.join(config["output_dir"], f"report-{timestamp}.json")
-    with open(json_path, "w") as f:
-        json.dump(report, f, indent=2)
+    _write_json(json_path, report)
 
     # Human-readable report
     diff_path = os.path.join(config["output_dir"], f"diff-{timestamp}.md")
+    out = []
+    out.append(f"# Autoprompt Report\n")
+    out.append(f"**{timestamp}** | Papers: {len(papers)} | Suggestions: {len(suggestions)}\n\n")
+
+    out.append("## Papers\n\n")
+    for p in papers[:20]:
+        out.append(f"### [{p['score']}] {p['title'][:100]}\n")
+        out.append(f"Keywords: {', '.join(p['matched_keywords'])}\n")
+        out.append(f"Link: {p['link']}\n\n")
+
+        analysis = p.get("llm_analysis", {})
+        if analysis and not analysis.get("error") and not analysis.get("parse_error") and not analysis.get("skipped"):
+            out.append(f"**Relevance:** {analysis.get('relevance', 'unknown')}\n")
+            out.append(f"**Summary:** {analysis.get('summary', 'N/A')}\n")
+            out.append(f"**Attack Surface:** {analysis.get('attack_surface', 'N/A')}\n")
+            out.append(f"**SCT Codes:** {', '.join(analysis.get('sct_codes', []))}\n")
+            out.append(f"**Defense Implications:** {analysis.get('defense_implications', 'N/A')}\n")
+            if analysis.get("action_items"):
+                out.append("**Action Items:**\n")
+                for item in analysis["action_items"]:
+                    out.append(f"  - {item}\n")
+            out.append("\n")
+        elif analysis.get("raw_summary"):
+            out.append(f"**Analysis:** {analysis['raw_summary'][:500]}\n\n")
+
+    if suggestions:
+        out.append("## Suggested Prompt Updates\n\n")
+        for s in suggestions:
+            out.append(f"### {s.type} -> `{s.target_file}` / {s.target_section}\n\n")
+            out.append(f"> {s.suggestion}\n\n")
+            out.append(f"Source: [{s.paper}]({s.paper_link}) (score: {s.paper_score})\n\n")
+            out.append("---\n\n")
+
     with open(diff_path, "w") as f:
-        f.write(f"# Autoprompt Report\n")
-        f.write(f"**{timestamp}** | Papers: {len(papers)} | Suggestions: {len(suggestions)}\n\n")
-
-        f.write("## Papers\n\n")
-        for p in papers[:20]:
-            f.write(f"### [{p['score']}] {p['title'][:100]}\n")
-            f.write(f"Keywords: {', '.join(p['matched_keywords'])}\n")
-            f.write(f"Link: {p['link']}\n\n")
-
-            analysis = p.get("llm_analysis", {})
-            if analysis and not analysis.get("error") and not analysis.get("parse_error"):
-                f.write(f"**Relevance:** {analysis.get('relevance', 'unknown')}\n")
-                f.write(f"**Summary:** {analysis.get('summary', 'N/A')}\n")
-                f.write(f"**Attack Surface:** {analysis.get('attack_surface', 'N/A')}\n")
-                f.write(f"**SCT Codes:** {', '.join(analysis.get('sct_codes', []))}\n")
-                f.write(f"**Defense Implications:** {analysis.get('defense_implications', 'N/A')}\n")
-                if analysis.get("action_items"):
-                    f.write("**Action Items:**\n")
-                    for item in analysis["action_items"]:
-                        f.write(f"  - {item}\n")
-                f.write("\n")
-            elif analysis.get("raw_summary"):
-                f.write(f"**Analysis:** {analysis['raw_summary'][:500]}\n\n")
-
-        if suggestions:
-            f.write("## Suggested Prompt Updates\n\n")
-            for s in suggestions:
-                f.write(f"### {s['type']} -> `{s['target_file']}` / {s['target_section']}\n\n")
-                f.write(f"> {s['suggestion']}\n\n")
-                f.write(f"Source: [{s['paper']}]({s['paper_link']}) (score: {s['paper_score']})\n\n")
-                f.write("---\n\n")
+        f.write("".join(out))
 
     print(f"[autoprompt] Report: {diff_path}")
     print(f"[autoprompt] JSON:   {json_path}")
@@ -167,18 +193,36 @@ def run(config_path="config.yaml"):
 
 
 def _push_and_clean(output_dir, keep_days=7):
-    """Commit output, push to git, delete files older than keep_days."""
+    """Delete output older than keep_days, then commit and push to git."""
     import subprocess
-    import glob
-    from datetime import datetime, timedelta
+    from datetime import datetime
+
+    now = datetime.now()
+
+    # Clean old output first so deletions land in the same commit
+    cutoff = now.timestamp() - (keep_days * 86400)
+    cleaned = 0
+    with os.scandir(output_dir) as it:
+        for entry in it:
+            if entry.name.startswith(".") or not entry.is_file():
+                continue
+            if entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+                cleaned += 1
+    if cleaned:
+        print(f"[autoprompt] Cleaned {cleaned} files older than {keep_days} days")
 
     repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     try:
+        # `commit -a` would skip the new, untracked report files, so stage first
         subprocess.run(["git", "add", "-A"], cwd=repo_root, capture_output=True, timeout=30)
-        subprocess.run(
-            ["git", "commit", "-m", f"[autoprompt] daily run {datetime.now().strftime('%Y-%m-%d')}"],
+        commit = subprocess.run(
+            ["git", "commit", "-m", f"[autoprompt] daily run {now.strftime('%Y-%m-%d')}"],
             cwd=repo_root, capture_output=True, timeout=30
         )
+        if commit.returncode != 0:
+            print("[autoprompt] No commit made, skipping push")
+            return
         result = subprocess.run(
             ["git", "push", "origin", "master"],
             cwd=repo_root, capture_output=True, timeout=60
@@ -190,13 +234,6 @@ def _push_and_clean(output_dir, keep_days=7):
     except Exception as e:
         print(f"[autoprompt] Git error: {e}")
 
-    # Clean old output
-    cutoff = datetime.now().timestamp() - (keep_days * 86400)
-    for f in glob.glob(os.path.join(output_dir, "*")):
-        if os.path.getmtime(f) < cutoff:
-            os.remove(f)
-            print(f"[autoprompt] Cleaned: {os.path.basename(f)}")
-
 
 if __name__ == "__main__":
     os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
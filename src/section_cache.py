@@ -0,0 +1,48 @@
+"""On-disk memo of parsed prompt sections, invalidated by file mtime and size."""
+import json
+import os
+
+MAX_ENTRIES = 10000
+
+
+def load_cache(cache_path):
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path) as f:
+                cache = json.load(f)
+            if isinstance(cache, dict):
+                return cache
+        except (json.JSONDecodeError, OSError):
+            pass
+    return {}
+
+
+def save_cache(cache_path, cache):
+    os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+    with open(cache_path, "w") as f:
+        json.dump(cache, f)
+
+
+def get_sections(filepath, cache, parse):
+    """Return parse(filepath), reusing the cached result while the file is unchanged.
+
+    Entries are keyed by absolute path and kept in least-recently-used order,
+    so the cache never holds more than MAX_ENTRIES files.
+    """
+    key = os.path.abspath(filepath)
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        cache.pop(key, None)
+        return parse(filepath)
+
+    entry = cache.pop(key, None)
+    if entry and entry.get("mtime_ns") == stat.st_mtime_ns and entry.get("size") == stat.st_size:
+        cache[key] = entry
+        return entry["sections"]
+
+    sections = parse(filepath)
+    cache[key] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sections": sections}
+    while len(cache) > MAX_ENTRIES:
+        del cache[next(iter(cache))]
+    return sections
@@ -1,74 +1,525 @@
 """LLM summarization layer using local Ollama model."""
+import hashlib
 import json
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DEFAULT_MAX_PARALLEL = 4  # Ollama's default OLLAMA_NUM_PARALLEL
+DEFAULT_CACHE_FILE = "./state/llm_cache.json"
+MAX_CACHE_ENTRIES = 5000
+
+
+def _make_session():
+    """Session with pooled keep-alive connections to the Ollama server."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=32,
+        max_retries=Retry(total=3, backoff_factor=0.3),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
-def summarize_paper(paper, config):
-    """Summarize a paper and extract Seithar-relevant findings using local LLM."""
-    llm_config = config.get("llm", {})
-    if not llm_config.get("summarize", False):
-        return None
 
-    base_url = llm_config.get("base_url", "http://localhost:11434")
-    model = llm_config.get("model", "qwen2.5:7b")
+_SESSION = _make_session()
 
-    prompt = f"""You are a cognitive warfare research analyst. Analyze this paper for relevance to:
+
+# Static instructions, sent as Ollama's `system` field so every request shares
+# the same prefix and the server can reuse its cached prefill.
+_SYSTEM = """You are a cognitive warfare research analyst. Analyze papers for relevance to:
 1. Adversarial vulnerabilities in human decision-making
 2. Adversarial attacks on AI/LLM systems (prompt injection, jailbreaks)
 3. Cognitive manipulation techniques (propaganda, persuasion, deception)
 4. Defense mechanisms for both human and AI substrates
 
-Paper title: {paper.get('title', 'Unknown')}
-Abstract: {paper.get('summary', 'No abstract available')}
-
-Respond in this exact JSON format:
-{{
+For each paper, respond in this exact JSON format:
+{
   "relevance": "high|medium|low",
   "summary": "2-3 sentence summary of key findings",
   "attack_surface": "what vulnerability or attack vector this paper addresses",
   "sct_codes": ["SCT-XXX codes that map to this paper's findings"],
   "defense_implications": "how findings can improve cognitive/AI defense",
   "action_items": ["specific updates to make to Seithar tooling based on this paper"]
-}}
+}
 
 Be precise. No filler. Clinical."""
 
+KEEP_ALIVE = "1h"  # keep the model and its prompt cache loaded between calls
+NUM_PREDICT = 256  # generation budget per paper; the object is ~220 tokens
+
+# Ollama structured-output schema, so replies are constrained to bare JSON
+_ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "relevance": {"type": "string", "enum": ["high", "medium", "low"]},
+        "summary": {"type": "string"},
+        "attack_surface": {"type": "string"},
+        "sct_codes": {"type": "array", "items": {"type": "string"}},
+        "defense_implications": {"type": "string"},
+        "action_items": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["relevance", "summary"],
+}
+
+# Abstracts too short to analyze skip the model
+MIN_ABSTRACT_CHARS = 200
+
+
+@dataclass(frozen=True, slots=True)
+class LLMCfg:
+    """The llm section of config.yaml, resolved once per batch."""
+    base_url: str
+    model: str
+    enabled: bool
+    temperature: float
+    num_predict: int
+    keep_alive: str
+    cache: bool
+    system: str
+
+
+def _resolve(config):
+    """Build an LLMCfg from config; an LLMCfg passes through unchanged."""
+    if isinstance(config, LLMCfg):
+        return config
+    c = config.get("llm", {})
+    return LLMCfg(
+        base_url=c.get("base_url", "http://localhost:11434"),
+        model=c.get("model", "qwen2.5:7b"),
+        enabled=c.get("summarize", False),
+        temperature=c.get("temperature", 0.3),
+        num_predict=c.get("num_predict", NUM_PREDICT),
+        keep_alive=c.get("keep_alive", KEEP_ALIVE),
+        cache=c.get("cache", True),
+        system=_SYSTEM,
+    )
+
+
+# Fallback extraction of the outermost object / array from a noisy reply
+_OBJECT_SPAN = re.compile(r"\{.*\}", re.S)
+_ARRAY_SPAN = re.compile(r"\[.*\]", re.S)
+
+
+def _loads(text):
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
+def _paper_block(paper):
+    return (
+        f"Paper title: {paper.get('title', 'Unknown')}\n"
+        f"Abstract: {paper.get('summary', 'No abstract available')}"
+    )
+
+
+def _paper_prompt(paper):
+    """Build the per-paper part of the prompt; the instructions are in _SYSTEM."""
+    return f"{_paper_block(paper)}\n\nRespond with the JSON object only."
+
+
+def _is_reply_value(span, opener):
+    """True if span parses as an object, or as a non-empty array of objects."""
     try:
-        resp = requests.post(
-            f"{base_url}/api/generate",
-            json={
-                "model": model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {"temperature": 0.3, "num_predict": 512}
-            },
-            timeout=120
-        )
+        value = _loads(span)
+    except json.JSONDecodeError:
+        return False
+    if opener == "{":
+        return True
+    return bool(value) and all(isinstance(item, dict) for item in value)
+
+
+def _read_until_json_closes(lines, opener):
+    """Return the first complete JSON value in a streamed reply.
+
+    Scanning starts at the first ``opener`` ("{" or "[", the top level the
+    schema asks for) and tracks {}/[] depth from there, ignoring brackets
+    inside strings. A balanced span that is not a reply value (bracketed
+    prose before the JSON) is skipped and the scan resumes after its opener.
+    Once a value is found the stream is read on to its final chunk, so the
+    connection can go back to the pool; with a schema the model stops right
+    after the value anyway. If more text follows (the server ignored the
+    schema), it stops there instead of waiting for the prose. Without a
+    complete value the whole reply is returned for _parse_reply.
+    """
+    text = ""
+    pos = depth = 0
+    start = None
+    in_string = escaped = False
+    value = None
+    for line in lines:
+        if not line:
+            continue
+        chunk = json.loads(line)
+        if chunk.get("error"):
+            raise RuntimeError(chunk["error"])
+        fragment = chunk.get("response", "")
+        if value is not None:
+            if fragment.strip():
+                break
+        else:
+            text += fragment
+            while pos < len(text):
+                ch = text[pos]
+                if start is None:
+                    if ch == opener:
+                        start, depth = pos, 1
+                elif in_string:
+                    if escaped:
+                        escaped = False
+                    elif ch == "\\":
+                        escaped = True
+                    elif ch == '"':
+                        in_string = False
+                elif ch in "{[":
+                    depth += 1
+                elif ch in "}]":
+                    depth -= 1
+                    if depth == 0:
+                        if _is_reply_value(text[start:pos + 1], opener):
+                            value = text[start:pos + 1]
+                            break
+                        pos, start = start, None
+                elif ch == '"':
+                    in_string = True
+                pos += 1
+        if chunk.get("done"):
+            for _ in lines:
+                pass
+            break
+    return text if value is None else value
+
+
+def _generate(prompt, cfg, session, num_predict, schema):
+    """Stream one generation from Ollama and return the response text.
+
+    A reply that runs on past its JSON value closes the connection early,
+    which cancels any further decoding on the server.
+    """
+    with (session or _SESSION).post(
+        f"{cfg.base_url}/api/generate",
+        json={
+            "model": cfg.model,
+            "system": cfg.system,
+            "prompt": prompt,
+            "stream": True,
+            "keep_alive": cfg.keep_alive,
+            "format": schema,
+            "options": {"temperature": cfg.temperature, "num_predict": num_predict}
+        },
+        stream=True,
+        timeout=120 * max(1, num_predict // NUM_PREDICT)
+    ) as resp:
         resp.raise_for_status()
-        result = resp.json().get("response", "")
+        opener = "[" if schema.get("type") == "array" else "{"
+        return _read_until_json_closes(resp.iter_lines(), opener)
+
+
+class _CallSession(threading.local):
+    """Session for the _memo_call in progress on this thread, kept out of its key."""
+    value = None
+
+
+_call_session = _CallSession()
+
+
+class _UnparsedReply(Exception):
+    """Carries a reply that did not parse out of _memo_call, so it is not memoized."""
+
+
+@lru_cache(maxsize=4096)
+def _memo_call(prompt, cfg):
+    result = _generate(prompt, cfg, _call_session.value, cfg.num_predict, _ANALYSIS_SCHEMA)
+    if not isinstance(_parse_reply(result, _OBJECT_SPAN), dict):
+        raise _UnparsedReply(result)
+    return result
+
+
+def _cached_call(prompt, cfg, session):
+    """Return the raw reply for a single-paper prompt, memoized in-process.
+
+    The prompt carries the paper's title and abstract, so duplicate papers
+    within a run (or across runs in one process) reach the model once.
+    Like the disk cache, only replies that parse are kept; failed calls and
+    unparseable replies are retried next time. With llm.cache off every
+    call goes to the model.
+    """
+    if not cfg.cache:
+        return _generate(prompt, cfg, session, cfg.num_predict, _ANALYSIS_SCHEMA)
+    _call_session.value = session
+    try:
+        return _memo_call(prompt, cfg)
+    except _UnparsedReply as e:
+        return e.args[0]
+    finally:
+        _call_session.value = None
+
+
+def _warmup(cfg, session):
+    """Load the model before the first real request.
+
+    An empty prompt makes Ollama load the model and return immediately;
+    failures are left for the real requests to report.
+    """
+    try:
+        (session or _SESSION).post(
+            f"{cfg.base_url}/api/generate",
+            json={"model": cfg.model, "prompt": "", "keep_alive": cfg.keep_alive},
+            timeout=600,
+        ).close()
+    except requests.RequestException:
+        pass
+
 
-        # Try to parse JSON from response
+def _parse_reply(result, span_re):
+    """Parse a structured-output reply, or return None.
+
+    Replies are normally bare JSON. If the server ignored the schema, fall
+    back to the outermost span matched by span_re.
+    """
+    try:
+        return _loads(result)
+    except json.JSONDecodeError:
+        pass
+    m = span_re.search(result)
+    if m:
         try:
-            # Find JSON block in response
-            start = result.find("{")
-            end = result.rfind("}") + 1
-            if start >= 0 and end > start:
-                return json.loads(result[start:end])
+            return _loads(m.group(0))
         except json.JSONDecodeError:
             pass
+    return None
+
+
+def _prefilter(paper):
+    """Return a low-relevance analysis for papers not worth an LLM call, else None."""
+    abstract = paper.get("summary", "") or ""
+    if len(abstract) < MIN_ABSTRACT_CHARS:
+        return {"relevance": "low", "skipped": "short_abstract"}
+    return None
+
+
+def summarize_paper(paper, config, session=None):
+    """Summarize a paper and extract Seithar-relevant findings using local LLM.
 
+    ``config`` is the full config dict or an already resolved LLMCfg.
+    Requests go through the module's shared session unless one is passed in.
+    """
+    cfg = _resolve(config)
+    if not cfg.enabled:
+        return None
+
+    skipped = _prefilter(paper)
+    if skipped:
+        return skipped
+
+    prompt = _paper_prompt(paper)
+
+    try:
+        result = _cached_call(prompt, cfg, session)
+        parsed = _parse_reply(result, _OBJECT_SPAN)
+        if isinstance(parsed, dict):
+            return parsed
         return {"raw_summary": result, "parse_error": True}
 
     except Exception as e:
         return {"error": str(e)}
 
 
-def batch_summarize(papers, config):
-    """Summarize a batch of papers."""
-    results = []
+def summarize_papers_bulk(papers, config, session=None):
+    """Summarize several papers with a single generation.
+
+    The prompt carries one numbered block per paper after the shared system
+    instructions, and the model is asked for a JSON array in the same order.
+    Returns one analysis dict per paper, or None if the call failed or the
+    reply was not an array of the right length; callers fall back to
+    summarize_paper.
+    """
+    cfg = _resolve(config)
+    if not cfg.enabled:
+        return None
+
+    blocks = "\n\n".join(
+        f"<<<PAPER {i}>>>\n{_paper_block(paper)}" for i, paper in enumerate(papers, 1)
+    )
+    prompt = (
+        f"{blocks}\n\n"
+        f"Respond with a JSON array of exactly {len(papers)} objects, "
+        "one per paper in the order given."
+    )
+
+    try:
+        schema = {"type": "array", "items": _ANALYSIS_SCHEMA}
+        result = _generate(prompt, cfg, session, cfg.num_predict * len(papers), schema)
+    except Exception:
+        return None
+    parsed = _parse_reply(result, _ARRAY_SPAN)
+    if not isinstance(parsed, list) or len(parsed) != len(papers):
+        return None
+    if not all(isinstance(item, dict) for item in parsed):
+        return None
+    return parsed
+
+
+def _cache_key(cfg, prompt):
+    return hashlib.sha256("\x00".join((cfg.model, cfg.system, prompt)).encode("utf-8")).hexdigest()
+
+
+def _load_cache(cache_file):
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file) as f:
+                cache = json.load(f)
+            if isinstance(cache, dict):
+                return cache
+        except (json.JSONDecodeError, OSError):
+            pass
+    return {}
+
+
+def _save_cache(cache_file, cache):
+    # entries are kept in least-recently-used order, oldest first
+    while len(cache) > MAX_CACHE_ENTRIES:
+        del cache[next(iter(cache))]
+    os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
+    with open(cache_file, "w") as f:
+        json.dump(cache, f)
+
+
+def _group_papers(papers, batch_tokens):
+    """Split papers into consecutive groups whose abstracts fit batch_tokens.
+
+    Tokens are estimated at ~4 characters each; a paper larger than the
+    budget still gets a group of its own.
+    """
+    groups = []
+    current, used = [], 0
     for paper in papers:
-        summary = summarize_paper(paper, config)
-        if summary:
-            paper["llm_analysis"] = summary
-        results.append(paper)
-    return results
+        cost = (len(paper.get("title", "")) + len(paper.get("summary", ""))) // 4 + 1
+        if current and used + cost > batch_tokens:
+            groups.append(current)
+            current, used = [], 0
+        current.append(paper)
+        used += cost
+    if current:
+        groups.append(current)
+    return groups
+
+
+def batch_summarize(papers, config, session=None):
+    """Summarize a batch of papers and return them as a list.
+
+    See batch_summarize_stream.
+    """
+    return list(batch_summarize_stream(papers, config, session))
+
+
+def batch_summarize_stream(papers, config, session=None):
+    """Summarize a batch of papers, yielding each one as its analysis is ready.
+
+    Up to llm.max_parallel requests are in flight at once so Ollama can
+    batch them, with at most twice that many queued ahead of the consumer;
+    papers are yielded in input order, and closing the generator cancels
+    queued requests. ``session`` overrides the shared requests session,
+    e.g. for testing. The model is loaded with a warmup request first, and
+    llm.keep_alive (default 1h) keeps it loaded.
+
+    With llm.batch_tokens set, papers are packed into groups of up to that
+    many abstract tokens and each group is summarized in one generation.
+
+    Parsed analyses are cached on disk in llm.cache_file, keyed by a hash of
+    the model and the paper's prompt, so unchanged papers are not sent to
+    the model again; single-paper replies are also memoized in-process.
+    Set llm.cache to false to bypass both. Papers with the same prompt
+    within a batch share a single request.
+    """
+    llm_config = config.get("llm", {})
+    cfg = _resolve(config)
+    if not cfg.enabled:
+        yield from papers
+        return
+    cache_file = llm_config.get("cache_file", DEFAULT_CACHE_FILE) if cfg.cache else None
+    cache = _load_cache(cache_file) if cache_file else {}
+
+    keys = {}
+    pending = []
+    hits = False
+    leaders = {}  # cache key -> the pending paper sent for it
+    duplicates = {}  # id(paper) -> leader of a paper with the same key
+    for paper in papers:
+        skipped = _prefilter(paper)
+        if skipped:
+            paper["llm_analysis"] = skipped
+            continue
+        key = _cache_key(cfg, _paper_prompt(paper))
+        if key in cache:
+            # move hits to the end so trimming drops least recently used first
+            paper["llm_analysis"] = cache[key] = cache.pop(key)
+            hits = True
+        elif key in leaders:
+            duplicates[id(paper)] = leaders[key]
+        else:
+            keys[id(paper)] = key
+            leaders[key] = paper
+            pending.append(paper)
+
+    batch_tokens = llm_config.get("batch_tokens")
+    if pending:
+        _warmup(cfg, session)
+
+    if batch_tokens:
+        groups = _group_papers(pending, batch_tokens)
+    else:
+        groups = [[paper] for paper in pending]
+
+    def summarize_group(group):
+        if len(group) > 1:
+            summaries = summarize_papers_bulk(group, cfg, session)
+            if summaries is not None:
+                return summaries
+        return [summarize_paper(paper, cfg, session) for paper in group]
+
+    def collect(group, summaries):
+        for paper, summary in zip(group, summaries):
+            if summary:
+                paper["llm_analysis"] = summary
+                if not summary.get("error") and not summary.get("parse_error"):
+                    cache[keys[id(paper)]] = summary
+
+    max_parallel = llm_config.get("max_parallel", DEFAULT_MAX_PARALLEL)
+    workers = max(1, min(max_parallel, len(groups)))
+    group_of = {id(paper): i for i, group in enumerate(groups) for paper in group}
+    ahead = workers * 2
+    pool = ThreadPoolExecutor(max_workers=workers)
+    futures = deque(pool.submit(summarize_group, group) for group in groups[:ahead])
+    submitted, collected = len(futures), 0
+    try:
+        for paper in papers:
+            leader = duplicates.get(id(paper), paper)
+            # pending papers appear in group order, so groups finish in turn
+            last = group_of.get(id(leader), -1)
+            while collected <= last:
+                collect(groups[collected], futures.popleft().result())
+                collected += 1
+                if submitted < len(groups):
+                    futures.append(pool.submit(summarize_group, groups[submitted]))
+                    submitted += 1
+            if leader is not paper and "llm_analysis" in leader:
+                paper["llm_analysis"] = leader["llm_analysis"]
+            yield paper
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        if cache_file and (pending or hits):
+            _save_cache(cache_file, cache)
@@ -9,6 +9,14 @@ techniques and accumulates evidence for known ones.
 Usage:
     python taxonomy_hook.py --paper-dir ./output
     python taxonomy_hook.py --paper-file ./output/paper.json
+    python taxonomy_hook.py --paper-dir ./output --json  # NDJSON, one result per line
+
+When calling the hook once per paper, skip promotion on each call and
+promote once at the end:
+    for f in ./output/*.json; do
+        python taxonomy_hook.py --paper-file "$f" --no-promote
+    done
+    python taxonomy_hook.py --promote-only
 
 Expected paper JSON format:
     {
@@ -22,9 +30,39 @@ Expected paper JSON format:
 
 import argparse
 import json
+import os
 import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Files at least this large are streamed with ijson, keeping only PAPER_KEYS
+STREAM_MIN_BYTES = 256 * 1024
+PAPER_KEYS = frozenset(("title", "source", "techniques"))
+
+DECODE_ERRORS = (json.JSONDecodeError,) + ((ijson.JSONError,) if ijson is not None else ())
+
+
+def _loads(data: bytes):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _dumps_line(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return json.dumps(obj).encode("utf-8") + b"\n"
+
 # Path to the evolve module
 EVOLVE_PATH = Path(__file__).parent.parent / "seithar-cogdef" / "taxonomy"
 sys.path.insert(0, str(EVOLVE_PATH))
@@ -41,42 +79,123 @@ except ImportError:
 
 
 def process_paper(paper: dict) -> list:
-    """Process a single paper's techniques against the taxonomy."""
-    results = []
+    """Process a single paper's techniques against the taxonomy.
+
+    Uses evolve.propose_candidates_batch when the installed evolve provides
+    it, so a paper's techniques are submitted in one call; otherwise falls
+    back to one propose_candidate call per technique.
+    """
     source = paper.get("source", paper.get("title", "unknown"))
-    techniques = paper.get("techniques", [])
-
-    for tech in techniques:
-        desc = tech.get("description", "")
-        evidence = tech.get("evidence", "")
-        if not desc:
-            continue
-        result = evolve.propose_candidate(
+    items = [
+        (tech["description"], source, tech.get("evidence", ""))
+        for tech in paper.get("techniques", [])
+        if tech.get("description")
+    ]
+    if not items:
+        return []
+
+    propose_batch = getattr(evolve, "propose_candidates_batch", None)
+    if propose_batch is not None:
+        return list(propose_batch(items))
+
+    return [
+        evolve.propose_candidate(
             technique_description=desc,
-            source=source,
+            source=src,
             evidence=evidence,
         )
-        results.append(result)
+        for desc, src, evidence in items
+    ]
+
+
+def _stream_paper(f) -> dict:
+    """Build a paper dict from the top-level PAPER_KEYS only.
+
+    Values under any other key are skipped as parse events and never
+    materialized.
+    """
+    paper = {}
+    key = builder = None
+    for prefix, event, value in ijson.parse(f, use_float=True):
+        if prefix == "":
+            if builder is not None:
+                paper[key] = builder.value
+                builder = None
+            if event == "map_key" and value in PAPER_KEYS:
+                key, builder = value, ijson.ObjectBuilder()
+        elif builder is not None:
+            builder.event(event, value)
+    return paper
+
+
+def load_paper_file(path: str) -> dict:
+    """Read and parse a single paper JSON file.
+
+    Large files are streamed through ijson when it is installed.
+    """
+    with open(path, "rb") as f:
+        if ijson is not None and os.fstat(f.fileno()).st_size >= STREAM_MIN_BYTES:
+            return _stream_paper(f)
+        return _loads(f.read())
+
+
+def process_paper_file(path: str) -> list:
+    """Load and process a single paper JSON file."""
+    return process_paper(load_paper_file(path))
 
-    return results
 
+def iter_paper_dir(dir_path: str):
+    """Process all paper JSON files in a directory, yielding results as they come.
 
-def process_paper_file(path: Path) -> list:
-    """Load and process a single paper JSON file."""
-    with open(path, "r", encoding="utf-8") as f:
-        paper = json.load(f)
-    return process_paper(paper)
+    Files are read and parsed on a thread pool, a bounded number ahead of
+    the one being processed; taxonomy updates are still applied one paper
+    at a time, in filename order.
+    """
+    with os.scandir(dir_path) as it:
+        paths = [
+            entry.path for entry in it
+            if entry.name.endswith(".json") and not entry.name.startswith(".") and entry.is_file()
+        ]
+    paths.sort()
+    workers = min(32, (os.cpu_count() or 1) * 4)
+    todo = iter(paths)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        loads = deque(
+            (fpath, pool.submit(load_paper_file, fpath))
+            for fpath in islice(todo, workers * 2)
+        )
+        while loads:
+            fpath, load = loads.popleft()
+            for nxt in islice(todo, 1):
+                loads.append((nxt, pool.submit(load_paper_file, nxt)))
+            try:
+                yield from process_paper(load.result())
+            except DECODE_ERRORS + (KeyError,) as e:
+                print(f"WARNING: Skipping {fpath}: {e}", file=sys.stderr)
 
 
-def process_paper_dir(dir_path: Path) -> list:
+def process_paper_dir(dir_path: str) -> list:
     """Process all paper JSON files in a directory."""
-    results = []
-    for fpath in sorted(dir_path.glob("*.json")):
-        try:
-            results.extend(process_paper_file(fpath))
-        except (json.JSONDecodeError, KeyError) as e:
-            print(f"WARNING: Skipping {fpath}: {e}", file=sys.stderr)
-    return results
+    return list(iter_paper_dir(dir_path))
+
+
+def format_result(r: dict) -> str:
+    action = r.get("action", "unknown")
+    code = r.get("code_id", "?")
+    if action == "created_candidate":
+        return f"[NEW] {code}: {r.get('name', '')}"
+    if action == "evidence_added":
+        return f"[+EV] {code}: evidence #{r.get('total_evidence', '?')}"
+    return f"[???] {json.dumps(r)}"
+
+
+def promote():
+    """Promote candidates with enough independent sources."""
+    promoted = evolve.promote_candidates(min_sources=3)
+    if promoted:
+        sys.stdout.write("".join(
+            f"[PROMOTED] {p['code_id']} (sources: {p['sources']})\n" for p in promoted
+        ))
 
 
 def main():
@@ -85,37 +204,46 @@ def main():
     )
     parser.add_argument("--paper-dir", help="Directory of paper JSON files")
     parser.add_argument("--paper-file", help="Single paper JSON file")
-    parser.add_argument("--json", action="store_true", help="Output raw JSON")
+    parser.add_argument("--json", action="store_true",
+                        help="Output raw JSON, one result per line")
+    promotion = parser.add_mutually_exclusive_group()
+    promotion.add_argument("--no-promote", action="store_true",
+                           help="Skip the candidate promotion check")
+    promotion.add_argument("--promote-only", action="store_true",
+                           help="Only run the candidate promotion check")
 
     args = parser.parse_args()
 
+    if args.promote_only:
+        if args.paper_dir or args.paper_file:
+            parser.error("--promote-only cannot be combined with --paper-dir or --paper-file")
+        promote()
+        return
+
     if not args.paper_dir and not args.paper_file:
         parser.print_help()
         sys.exit(1)
 
-    results = []
+    streams = []
     if args.paper_file:
-        results = process_paper_file(Path(args.paper_file))
+        streams.append(process_paper_file(args.paper_file))
     if args.paper_dir:
-        results.extend(process_paper_dir(Path(args.paper_dir)))
+        streams.append(iter_paper_dir(args.paper_dir))
 
+    # Results are written as they are produced; stdout's own buffering
+    # batches the writes
     if args.json:
-        print(json.dumps(results, indent=2))
+        sys.stdout.flush()
+        out = sys.stdout.buffer
+        for r in chain.from_iterable(streams):
+            out.write(_dumps_line(r))
     else:
-        for r in results:
-            action = r.get("action", "unknown")
-            code = r.get("code_id", "?")
-            if action == "created_candidate":
-                print(f"[NEW] {code}: {r.get('name', '')}")
-            elif action == "evidence_added":
-                print(f"[+EV] {code}: evidence #{r.get('total_evidence', '?')}")
-            else:
-                print(f"[???] {json.dumps(r)}")
+        for r in chain.from_iterable(streams):
+            sys.stdout.write(format_result(r) + "\n")
 
     # Run promotion check after processing
-    promoted = evolve.promote_candidates(min_sources=3)
-    for p in promoted:
-        print(f"[PROMOTED] {p['code_id']} (sources: {p['sources']})")
+    if not args.no_promote:
+        promote()
 
 
 if __name__ == "__main__":